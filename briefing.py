@@ -0,0 +1,239 @@
+"""
+Shared plumbing for the news, tech and gaming briefings.
+
+Each generator fetches a handful of RSS feeds, asks the model for a briefing and
+writes it into a page's <div id="article">. Only the feeds, prompts and page
+details differ, so those stay in each generator and the common steps live here.
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from itertools import chain
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import feed_cache
+
+try:
+    from lxml import etree as ET
+    _HAVE_LXML = True
+except ImportError:  # lxml is optional; fall back to the stdlib parser
+    import xml.etree.ElementTree as ET
+    _HAVE_LXML = False
+
+# One pooled session for every feed of every briefing: connections and TLS
+# sessions are reused, and transient upstream errors get a couple of retries.
+SESSION = requests.Session()
+SESSION.headers.update({
+    "User-Agent": "HearditFirst/1.0 (+https://www.alittlebirdy.org)",
+    "Accept-Encoding": "gzip, deflate",
+})
+_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+SESSION.mount("https://", _ADAPTER)
+SESSION.mount("http://", _ADAPTER)
+
+
+def iter_items(resp):
+    """
+    Stream <item> elements out of an RSS response while it is still downloading,
+    clearing each one once the caller is done with it so memory stays flat
+    however large the feed is.
+    """
+    if _HAVE_LXML:
+        # recover=True keeps one malformed feed from aborting the whole run
+        parser = ET.XMLPullParser(events=("end",), tag="item", recover=True)
+    else:
+        parser = ET.XMLPullParser(events=("end",))
+
+    # Parse each chunk as it arrives so parsing overlaps the network read;
+    # a caller that stops early also stops the download
+    for chunk in resp.iter_content(chunk_size=8192):
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if elem.tag != "item":
+                continue
+            yield elem
+            elem.clear()
+            if _HAVE_LXML:
+                # Drop already-processed siblings so the partial tree doesn't grow
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+
+def _fetch_feed(url, validators, parse_item, max_items):
+    """Fetch one feed and return the dicts built by parse_item, up to max_items if given."""
+    items = []
+    try:
+        headers = feed_cache.conditional_headers(validators, url)
+        # (connect, read) timeouts so a dead host fails fast
+        with SESSION.get(url, headers=headers, timeout=(3, 10), stream=True) as resp:
+            if resp.status_code == 304:
+                print(f"Feed unchanged, using cached items: {url}")
+                return feed_cache.load_items(url)
+            resp.raise_for_status()
+            for elem in iter_items(resp):
+                item = parse_item(elem)
+                if item:
+                    items.append(item)
+                    # A caller that takes the first max_items overall can't use more
+                    # than that from one feed, so stop parsing here
+                    if max_items is not None and len(items) >= max_items:
+                        break
+            feed_cache.remember(validators, url, resp, items)
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+    return items
+
+
+def fetch_feeds(feeds, parse_item, max_items=None):
+    """
+    Fetch every feed concurrently and return all their items, in feed order.
+    parse_item turns an <item> element into a dict, or None to skip it.
+    max_items caps how many items each feed contributes; None reads whole feeds.
+    """
+    validators = feed_cache.load_validators()
+
+    # The feeds are independent and network-bound, so total wait is the slowest
+    # feed, not the sum; map() keeps results in feed order for stable dedupe.
+    with ThreadPoolExecutor(max_workers=len(feeds)) as pool:
+        results = list(pool.map(
+            lambda url: _fetch_feed(url, validators, parse_item, max_items), feeds
+        ))
+    feed_cache.save_validators(validators)
+
+    return list(chain.from_iterable(results))
+
+
+# Trailing " - Source" attribution that syndicated headlines often carry
+_TITLE_SUFFIX_RE = re.compile(r"\s+-\s+[^-]+$")
+
+
+def norm_title(title):
+    """Normalize a headline for dedupe: casefold and drop a trailing ' - Source'."""
+    return _TITLE_SUFFIX_RE.sub("", title.strip().lower())
+
+
+def dedupe_by_title(items):
+    """Keep the first item for each normalized title, in their original order."""
+    by_title = {}
+    for it in items:
+        by_title.setdefault(norm_title(it["title"]), it)
+    return list(by_title.values())
+
+
+@lru_cache(maxsize=512)
+def format_date(raw, unknown="Unknown"):
+    """Convert RSS date -> YYYY-MM-DD (memoized; pubDate strings repeat across feeds within a run)."""
+    if not raw:
+        return unknown
+    try:
+        return parsedate_to_datetime(raw).date().strftime("%Y-%m-%d")
+    except Exception:
+        return raw
+
+
+# One numbered article entry in the prompt
+_BULLET_TPL = "{i}. {title}\n   Date: {date}\n   {desc}\n   Link: {link}"
+
+
+def render_articles(items, date_of, template=_BULLET_TPL):
+    """
+    Render items as the numbered article list for a prompt; date_of(item) gives
+    its date and template (i, title, date, desc, link fields) lays out each entry.
+    """
+    return "\n\n".join(
+        template.format_map({
+            "i": i,
+            "title": it["title"],
+            "date": date_of(it),
+            "desc": it["description"],
+            "link": it["link"],
+        })
+        for i, it in enumerate(items, start=1)
+    )
+
+
+def call_openai(client, model, system_prompt, prompt, max_tokens=900):
+    """Send prompt to the chat completions API and return the reply text."""
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ],
+        max_tokens=max_tokens,
+    )
+    return response.choices[0].message.content.strip()
+
+
+# Blank-line-separated blocks, and the '###' markdown header the prompts ask for
+_BLOCK_SPLIT = re.compile(r"\n{2,}")
+_HEADER_RE = re.compile(r"^#{3,}\s*(.*)", re.DOTALL)
+
+
+def summary_to_html(summary, sentence_sections=(), clean=None):
+    """
+    Turn the model's markdown-like summary into HTML: H2 for '###' headers, P for text.
+    Paragraphs under a header containing one of sentence_sections (lowercase)
+    are split into one <p> per sentence; clean, if given, is applied to each
+    paragraph block first.
+    """
+    parts = []
+    split_sentences = False  # whether the current section gets one <p> per sentence
+
+    for block in _BLOCK_SPLIT.split(summary):
+        text = block.strip()
+        if not text:
+            continue
+
+        header = _HEADER_RE.match(text)
+        if header:
+            clean_title = header.group(1).strip()
+            section = clean_title.lower()
+            split_sentences = any(name in section for name in sentence_sections)
+            parts.append(f"<h2>{clean_title}</h2>\n")
+            continue
+
+        if clean is not None:
+            text = clean(text)
+        if split_sentences:
+            for s in text.split(". "):
+                s = s.strip()
+                if s:
+                    parts.append(f"<p>{s}</p>\n" if s.endswith(".") else f"<p>{s}.</p>\n")
+        else:
+            parts.append(f"<p>{text}</p>\n")
+
+    return "".join(parts)
+
+
+# Matches the <div id="article">...</div> block: opening tag, inner HTML, closing tag
+_ARTICLE_RE = re.compile(r'(<div[^>]*id="article"[^>]*>)(.*?)(</div>)', re.DOTALL)
+
+
+def replace_article(html, inner_html):
+    """Return html with the inside of <div id="article"> set to inner_html, or None if there is no such div."""
+    # A function replacement keeps backslashes in the article from being read as escapes
+    new_html, count = _ARTICLE_RE.subn(
+        lambda m: m.group(1) + inner_html + m.group(3), html, count=1
+    )
+    return new_html if count else None
+
+
+def atomic_write(path, *parts):
+    """
+    Write parts to path via a temp file and os.replace, so a crash mid-write
+    never leaves a truncated page behind for the site (or the next run) to read.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(parts)
+    os.replace(tmp_path, path)
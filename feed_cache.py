@@ -0,0 +1,75 @@
+"""
+Conditional-GET support for the RSS fetchers.
+
+Each feed's ETag / Last-Modified validators are kept in .cache/rss_etags.json
+and its parsed items in .cache/rss_items/<sha1(url)>.json. When a publisher
+answers 304 Not Modified, the generators reuse the stored items instead of
+downloading and parsing the feed again.
+"""
+import hashlib
+import json
+import os
+
+CACHE_DIR = ".cache"
+VALIDATORS_PATH = os.path.join(CACHE_DIR, "rss_etags.json")
+ITEMS_DIR = os.path.join(CACHE_DIR, "rss_items")
+
+
+def _items_path(url):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(ITEMS_DIR, f"{digest}.json")
+
+
+def load_validators():
+    """Return {feed_url: {"etag": ..., "last_modified": ...}} from disk."""
+    try:
+        with open(VALIDATORS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_validators(validators):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(VALIDATORS_PATH, "w", encoding="utf-8") as f:
+        json.dump(validators, f, indent=2, sort_keys=True)
+
+
+def conditional_headers(validators, url):
+    """
+    Build If-None-Match / If-Modified-Since headers for url.
+    Returns {} if we have no stored items to fall back on for a 304.
+    """
+    saved = validators.get(url) or {}
+    if not os.path.exists(_items_path(url)):
+        return {}
+
+    headers = {}
+    if saved.get("etag"):
+        headers["If-None-Match"] = saved["etag"]
+    if saved.get("last_modified"):
+        headers["If-Modified-Since"] = saved["last_modified"]
+    return headers
+
+
+def remember(validators, url, resp, items):
+    """Store the response's validators and the parsed items for a 200 response."""
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        validators.pop(url, None)
+        return
+
+    os.makedirs(ITEMS_DIR, exist_ok=True)
+    with open(_items_path(url), "w", encoding="utf-8") as f:
+        json.dump(items, f)
+    validators[url] = {"etag": etag, "last_modified": last_modified}
+
+
+def load_items(url):
+    """Return the items stored for url, or [] if they have gone missing."""
+    try:
+        with open(_items_path(url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
@@ -1,12 +1,13 @@
+import mmap
 import os
 import datetime
 import textwrap
-import requests
-import xml.etree.ElementTree as ET
 import re
-from email.utils import parsedate_to_datetime
 from openai import OpenAI
 
+import briefing
+import llm_cache
+
 # ------------- CONFIG -------------
 
 GAMING_FEEDS = [
@@ -18,8 +19,10 @@ GAMING_FEEDS = [
 
 MAX_ARTICLES = 10
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+MODEL = "gpt-4.1-mini"
+SYSTEM_PROMPT = "You write calm, simple, neutral gaming news summaries."
 
+client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
 # ------------- HELPERS -------------
 
@@ -30,8 +33,9 @@ def _find_encoded_content(item):
     """
     for child in item:
         # handle namespaces: tag may look like '{http://purl.org/rss/1.0/modules/content/}encoded'
-        tag = child.tag or ""
-        if tag.lower().endswith("encoded"):
+        # lxml reports comments/processing instructions with a non-string tag
+        tag = child.tag
+        if isinstance(tag, str) and tag.lower().endswith("encoded"):
             return (child.text or "").strip()
     return None
 
@@ -60,76 +64,42 @@ def clean_truncation(text):
     return text.strip()
 
 
+def _parse_item(item):
+    """Turn one gaming RSS <item> into an article dict, or None if it has no title."""
+    title = item.findtext("title", "").strip()
+    if not title:
+        return None
+
+    # Prefer content:encoded when available (often contains fuller article HTML/text)
+    desc = _find_encoded_content(item) or item.findtext("description", "") or ""
+
+    return {
+        "title": title,
+        # Clean obvious truncation markers
+        "description": clean_truncation(desc.strip()),
+        "link": item.findtext("link", "").strip(),
+        "pub_raw": item.findtext("pubDate", "").strip(),
+    }
+
+
 def fetch_rss_items():
     """Pull items from gaming RSS feeds."""
-    items = []
-
-    for feed in GAMING_FEEDS:
-        try:
-            resp = requests.get(feed, timeout=10)
-            resp.raise_for_status()
-            root = ET.fromstring(resp.content)
-
-            for item in root.iter("item"):
-                title = item.findtext("title", "").strip()
-                # Prefer content:encoded when available (often contains fuller article HTML/text)
-                desc = _find_encoded_content(item) or item.findtext("description", "") or ""
-                desc = desc.strip()
-                link = item.findtext("link", "").strip()
-                pub_raw = item.findtext("pubDate", "").strip()
-
-                # Clean obvious truncation markers
-                desc = clean_truncation(desc)
-
-                if title:
-                    items.append({
-                        "title": title,
-                        "description": desc,
-                        "link": link,
-                        "pub_raw": pub_raw,
-                    })
-        except Exception as e:
-            print("Error fetching {}: {}".format(feed, e))
-
-    # De-duplicate by title
-    seen = set()
-    unique = []
-    for it in items:
-        if it["title"] not in seen:
-            seen.add(it["title"])
-            unique.append(it)
-
-    return unique[:MAX_ARTICLES]
+    items = briefing.fetch_feeds(GAMING_FEEDS, _parse_item, MAX_ARTICLES)
 
+    # De-duplicate by exact title in one pass (dicts keep insertion order) and
+    # stop as soon as the article budget is filled
+    unique = {}
+    for it in items:
+        if it["title"] not in unique:
+            unique[it["title"]] = it
+            if len(unique) >= MAX_ARTICLES:
+                break
 
-def format_date(raw):
-    """Convert RSS date -> YYYY-MM-DD."""
-    if not raw:
-        return "Unknown"
-    try:
-        dt = parsedate_to_datetime(raw)
-        return dt.date().strftime("%Y-%m-%d")
-    except Exception:
-        return raw
+    return list(unique.values())
 
 
-def build_prompt(items):
-    """Make a prompt specifically for summarizing gaming news."""
-    bullets = []
-    for i, it in enumerate(items, start=1):
-        bullets.append(
-            "{} . {}\n   Date: {}\n   {}\n   Link: {}".format(
-                i,
-                it["title"],
-                format_date(it["pub_raw"]),
-                it["description"],
-                it["link"],
-            )
-        )
-
-    articles_block = "\n\n".join(bullets)
-
-    prompt = """
+# Prompt wrapper around the article list, dedented once at import
+_PROMPT_TPL = textwrap.dedent("""
     Summarize today's most important gaming news into a clean, readable briefing.
 
     Requirements:
@@ -141,68 +111,51 @@ def build_prompt(items):
 
     Articles:
     {articles}
-    """.format(articles=articles_block)
+    """).strip()
+
+
+# One numbered article entry in the prompt
+_BULLET_TPL = "{i} . {title}\n   Date: {date}\n   {desc}\n   Link: {link}"
+
 
-    return textwrap.dedent(prompt).strip()
+def build_prompt(items):
+    """Make a prompt specifically for summarizing gaming news."""
+    articles_block = briefing.render_articles(
+        items, lambda it: briefing.format_date(it["pub_raw"]), _BULLET_TPL
+    )
 
+    return _PROMPT_TPL.format(articles=articles_block)
 
-def ask_chatgpt(prompt):
+
+def _call_openai(prompt):
     """Call OpenAI API."""
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "You write calm, simple, neutral gaming news summaries.",
-            },
-            {
-                "role": "user",
-                "content": prompt,
-            },
-        ],
-        max_tokens=900,
+    return briefing.call_openai(client, MODEL, SYSTEM_PROMPT, prompt)
+
+
+def ask_chatgpt(prompt, items):
+    """Return the summary for prompt, from the LLM cache when possible."""
+    key = llm_cache.prompt_key(MODEL, SYSTEM_PROMPT, prompt)
+    # Exact prompt match first, then a near-duplicate article set, then the API
+    return llm_cache.semantic_get_or_set(
+        key, "gaming", items, client, lambda: _call_openai(prompt)
     )
-    return response.choices[0].message.content.strip()
 
 
 def convert_summary_to_html(summary):
     """Turn ChatGPT's markdown-like format into HTML blocks."""
-    html = ""
-
-    for block in summary.split("\n\n"):
-        text = block.strip()
-        if not text:
-            continue
+    # Ensure we don't propagate trailing truncation markers from the model
+    return briefing.summary_to_html(summary, clean=clean_truncation)
 
-        if text.startswith("###"):
-            title = text.lstrip("#").strip()
-            html += "<h2>{}</h2>\n".format(title)
-        else:
-            # Ensure we don't propagate trailing truncation markers from the model
-            text = clean_truncation(text)
-            html += "<p>{}</p>\n".format(text)
 
-    return html
+# Matches the <div id="article">...</div> block: opening tag, inner HTML, closing tag.
+# A bytes pattern, so it can search the memory-mapped page directly.
+_ARTICLE_RE = re.compile(rb'(<div id="article">)(.*?)(</div>)', re.DOTALL)
 
 
 def update_gaming_page(summary_html):
     """Replace the <div id='article'>...</div> content inside gaming.html."""
     today = datetime.datetime.now().strftime("%B %d, %Y")
 
-    with open("gaming.html", "r", encoding="utf-8") as f:
-        html = f.read()
-
-    marker = '<div id="article">'
-    start = html.find(marker)
-    if start == -1:
-        raise RuntimeError("gaming.html missing <div id=\"article\">")
-
-    start_tag_end = html.find(">", start)
-    end = html.find("</div>", start_tag_end)
-
-    before = html[: start_tag_end + 1]
-    after = html[end:]
-
     inner_html = (
         "\n<p class=\"article-date\">Updated: "
         + today +
@@ -210,11 +163,32 @@ def update_gaming_page(summary_html):
         + summary_html +
         "\n"
     )
-
-    new_html = before + inner_html + after
-
-    with open("gaming.html", "w", encoding="utf-8") as f:
-        f.write(new_html)
+    new_inner = inner_html.encode("utf-8")
+
+    # Edit the page through mmap: the markers are found in the page cache and
+    # only the bytes from the article onward are ever rewritten.
+    with open("gaming.html", "r+b") as f:
+        with mmap.mmap(f.fileno(), 0) as mm:
+            match = _ARTICLE_RE.search(mm)
+            if match is None:
+                raise RuntimeError("gaming.html missing <div id=\"article\">")
+            start, end = match.span(2)
+            del match  # the match holds a view of mm, which must be released before close
+
+            if len(new_inner) == end - start:
+                # Same size: splice in place and leave everything else untouched
+                mm[start:end] = new_inner
+                mm.flush()
+                tail = None
+            else:
+                tail = mm[end:]
+
+        if tail is not None:
+            # Size changed: rewrite from the article start and trim the old end
+            f.seek(start)
+            f.write(new_inner)
+            f.write(tail)
+            f.truncate()
 
     print("gaming.html updated with new gaming summary.")
 
@@ -222,17 +196,29 @@ def update_gaming_page(summary_html):
 # ------------- MAIN -------------
 
 
-def main():
-    items = fetch_rss_items()
+def summarize(items):
+    """Return the (possibly cached) gaming summary for items, or None if there are none."""
+    if not items:
+        return None
+
+    prompt = build_prompt(items)
+    return ask_chatgpt(prompt, items)
+
+
+def publish(items, summary):
+    """Write the summary into gaming.html."""
     if not items:
         print("No gaming items fetched.")
         return
 
-    prompt = build_prompt(items)
-    summary = ask_chatgpt(prompt)
     summary_html = convert_summary_to_html(summary)
     update_gaming_page(summary_html)
 
 
+def main():
+    items = fetch_rss_items()
+    publish(items, summarize(items))
+
+
 if __name__ == "__main__":
     main()
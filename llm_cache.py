@@ -0,0 +1,193 @@
+"""
+Small on-disk cache for LLM responses, shared by the generators.
+
+The cron job often runs more often than the feeds change, so a run that sends
+the same prompt as a recent run can reuse that run's response instead of
+paying for another OpenAI round trip. Responses live in a SQLite table keyed
+on a hash of (model, system prompt, prompt). On top of the exact match,
+article sets whose titles embed close to a recent run's are treated as the
+same briefing (semantic cache).
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = ".cache"
+CACHE_TTL_SECONDS = 6 * 60 * 60
+DB_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+
+EMBEDDINGS_PATH = os.path.join(CACHE_DIR, "embeddings.jsonl")
+EMBEDDING_MODEL = "text-embedding-3-small"
+SIMILARITY_THRESHOLD = 0.92
+
+# Generators may summarize concurrently (see run_all.py); the embeddings file
+# is rewritten on every add, so serialize those read-modify-write cycles.
+_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def prompt_key(model, system, prompt):
+    """Hash model + system prompt + prompt, ignoring trailing whitespace on each line."""
+    normalized = "\n".join(line.rstrip() for line in prompt.strip().splitlines())
+    payload = json.dumps([model, system, normalized])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _connect():
+    # One short-lived connection per call keeps this safe to use from threads
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses "
+        "(key TEXT PRIMARY KEY, content TEXT NOT NULL, ts INTEGER NOT NULL)"
+    )
+    return conn
+
+
+def get(key, ttl=CACHE_TTL_SECONDS):
+    """Return the cached content for key, or None if it is missing or stale."""
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT content, ts FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"llm_cache read failed: {e}")
+        return None
+
+    if row is None or time.time() - row[1] > ttl:
+        return None
+    return row[0]
+
+
+def put(key, content, ts=None, ttl=CACHE_TTL_SECONDS):
+    """
+    Store content under key, replacing any older entry, and drop expired rows.
+    ts is when content was generated; it defaults to now.
+    """
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, content, ts) VALUES (?, ?, ?)",
+                    (key, content, int(now if ts is None else ts)),
+                )
+                # The file is carried between runs by the workflow cache, so keep
+                # it to rows that get() could still return
+                conn.execute("DELETE FROM responses WHERE ts < ?", (int(now - ttl),))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"llm_cache write failed: {e}")
+
+
+def get_or_set(key, fetch_fn, ttl=CACHE_TTL_SECONDS):
+    """Return the fresh cached content for key, or call fetch_fn() and cache its result."""
+    content = get(key, ttl)
+    if content is not None:
+        print(f"llm_cache hit {key[:12]}")
+        return content
+
+    print(f"llm_cache miss {key[:12]}")
+    content = fetch_fn()
+    put(key, content)
+    return content
+
+
+def embed(client, text):
+    """Embed text with the OpenAI embeddings API; None if the call fails."""
+    try:
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+        return response.data[0].embedding
+    except Exception as e:
+        print(f"Embedding failed; skipping semantic cache: {e}")
+        return None
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _load_embedding_rows(ttl=CACHE_TTL_SECONDS):
+    """Read the embeddings file, dropping rows older than ttl."""
+    try:
+        with open(EMBEDDINGS_PATH, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+    now = time.time()
+    return [row for row in rows if now - row.get("ts", 0) <= ttl]
+
+
+def find_similar(name, vector, threshold=SIMILARITY_THRESHOLD):
+    """Return (summary, ts) of the closest recent row for name if similar enough, else None."""
+    if vector is None:
+        return None
+
+    best_sim, best_row = 0.0, None
+    for row in _load_embedding_rows():
+        if row.get("name") != name:
+            continue
+        sim = _cosine(vector, row["vector"])
+        if sim > best_sim:
+            best_sim, best_row = sim, row
+
+    if best_sim > threshold:
+        print(f"Semantic cache hit for {name} (similarity {best_sim:.3f}).")
+        return best_row["summary"], best_row["ts"]
+    return None
+
+
+def add_embedding(name, vector, summary):
+    """Record a summary's embedding, pruning rows that have expired."""
+    if vector is None:
+        return
+    with _EMBEDDINGS_LOCK:
+        rows = _load_embedding_rows()
+        rows.append({
+            "name": name,
+            "vector": vector,
+            "summary": summary,
+            "ts": time.time(),
+        })
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(EMBEDDINGS_PATH, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+def semantic_get_or_set(key, name, items, client, fetch_fn, ttl=CACHE_TTL_SECONDS):
+    """
+    Like get_or_set, but on an exact-key miss first reuse a recent summary for
+    name whose article titles embed close to these items' titles; only then
+    call fetch_fn() and record the new summary.
+    """
+    content = get(key, ttl)
+    if content is not None:
+        print(f"llm_cache hit {key[:12]}")
+        return content
+
+    print(f"llm_cache miss {key[:12]}")
+    vector = embed(client, " ".join(it["title"] for it in items))
+    similar = find_similar(name, vector)
+    if similar is not None:
+        summary, ts = similar
+        # Keep the original timestamp so a reused summary still expires on
+        # schedule instead of getting a fresh TTL under the new key
+        put(key, summary, ts=ts, ttl=ttl)
+        return summary
+
+    summary = fetch_fn()
+    put(key, summary, ttl=ttl)
+    add_embedding(name, vector, summary)
+    return summary
@@ -1,13 +1,17 @@
 import os
 import datetime
 import textwrap
-import requests
-import xml.etree.ElementTree as ET
 from email.utils import parsedate_to_datetime
+from html import escape
 import re
+from functools import lru_cache
 
 from openai import OpenAI
 
+import briefing
+import llm_cache
+
+
 def get_local_date() -> datetime.date:
     """
     Return 'today' in your local time, based on a UTC offset.
@@ -32,54 +36,59 @@ RSS_FEEDS = [
 
 MAX_ARTICLES = 10
 
+MODEL = "gpt-4.1-mini"
+SYSTEM_PROMPT = (
+    "You write calm, neutral, easy-to-read daily news briefings for regular people. "
+    "Do NOT guess or infer political titles or offices for any person. "
+    "Only describe people using the roles or titles explicitly given in the article text. "
+    "If the article does not clearly state that someone is the current or former holder of a role, "
+    "just use their name without a title. Never call anyone 'current president' or 'former president' "
+    "unless those exact words appear in the article excerpt."
+)
+
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
+def _parse_pub_date(raw):
+    """Parse an RSS pubDate into a date, or None if it is missing/invalid."""
+    if not raw:
+        return None
+    try:
+        # normalize to date only
+        return parsedate_to_datetime(raw).date()
+    except Exception:
+        return None
+
+
+def _parse_item(item):
+    """Turn one RSS <item> into an article dict, or None if it has no title."""
+    title = item.findtext("title", default="").strip()
+    if not title:
+        return None
+    return {
+        "title": title,
+        "description": item.findtext("description", default="").strip(),
+        "link": item.findtext("link", default="").strip(),
+        "pub_date_raw": item.findtext("pubDate", default="").strip(),
+    }
+
 
 def fetch_rss_items():
     """Fetch top items from the RSS feeds, preferring today's stories."""
     today = get_local_date()
+    # Whole feeds, no per-feed cap: today's stories can sit deep in a feed
+    # ordered by editorial priority
+    items = briefing.fetch_feeds(RSS_FEEDS, _parse_item)
 
-    items = []
-    for feed_url in RSS_FEEDS:
-        try:
-            resp = requests.get(feed_url, timeout=10)
-            resp.raise_for_status()
-            root = ET.fromstring(resp.content)
-            for item in root.iter("item"):
-                title = item.findtext("title", default="").strip()
-                desc = item.findtext("description", default="").strip()
-                link = item.findtext("link", default="").strip()
-                pub_date_raw = item.findtext("pubDate", default="").strip()
-
-                pub_date = None
-                if pub_date_raw:
-                    try:
-                        dt = parsedate_to_datetime(pub_date_raw)
-                        # normalize to date only
-                        pub_date = dt.date()
-                    except Exception:
-                        pub_date = None
-
-                if title:
-                    items.append(
-                        {
-                            "title": title,
-                            "description": desc,
-                            "link": link,
-                            "pub_date_raw": pub_date_raw,
-                            "pub_date": pub_date,
-                        }
-                    )
-        except Exception as e:
-            print(f"Error fetching {feed_url}: {e}")
-
-    # Basic dedupe by title
-    seen = set()
-    unique = []
-    for it in items:
-        if it["title"] not in seen:
-            seen.add(it["title"])
-            unique.append(it)
+    # Dedupe by normalized title so cross-feed copies ("X - BBC" vs "x") collapse.
+    # Every candidate is kept, since the date preference below needs them all.
+    unique = briefing.dedupe_by_title(items)
+
+    # pub_date is derived here rather than cached, since dates don't round-trip through JSON;
+    # the escaped title/link are derived once here too, for every page that renders them
+    for it in unique:
+        it["pub_date"] = _parse_pub_date(it["pub_date_raw"])
+        it["title_html"] = escape(it["title"], quote=True)
+        it["link_html"] = escape(it["link"], quote=True)
 
     # First preference: only today's articles
     todays_items = [
@@ -110,29 +119,11 @@ def fetch_rss_items():
 
 def format_pub_date(raw: str) -> str:
     """Convert RSS pubDate string to YYYY-MM-DD where possible."""
-    if not raw:
-        return "Unknown date"
-    try:
-        dt = parsedate_to_datetime(raw)
-        return dt.date().strftime("%Y-%m-%d")
-    except Exception:
-        return raw
+    return briefing.format_date(raw, "Unknown date")
 
 
-def build_prompt(items):
-    """Build the prompt we send to ChatGPT from the news items."""
-    bullets = []
-    for i, it in enumerate(items, start=1):
-        date_str = format_pub_date(it.get("pub_date_raw", ""))
-        bullets.append(
-            f"{i}. {it['title']}\n"
-            f"   Date: {date_str}\n"
-            f"   {it['description']}\n"
-            f"   Link: {it['link']}"
-        )
-    news_block = "\n\n".join(bullets)
-
-    prompt = f"""
+# Prompt wrapper around the article list, dedented once at import
+_PROMPT_TPL = textwrap.dedent("""
     You are an assistant writing a daily news briefing for a general audience.
 
     Using ONLY the information in the articles below, write a clear, neutral summary of today's most important news. Do not add facts that aren't mentioned.
@@ -149,32 +140,30 @@ def build_prompt(items):
     Here are the articles:
 
     {news_block}
-    """
-    return textwrap.dedent(prompt).strip()
+    """).strip()
+
+
+def build_prompt(items):
+    """Build the prompt we send to ChatGPT from the news items."""
+    news_block = briefing.render_articles(
+        items, lambda it: format_pub_date(it.get("pub_date_raw", ""))
+    )
+
+    return _PROMPT_TPL.format(news_block=news_block)
 
 
-def ask_chatgpt(prompt: str) -> str:
+def _call_openai(prompt: str) -> str:
     """Send the prompt to ChatGPT (OpenAI API) and return the summary text."""
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
- {
-    "role": "system",
-    "content": (
-        "You write calm, neutral, easy-to-read daily news briefings for regular people. "
-        "Do NOT guess or infer political titles or offices for any person. "
-        "Only describe people using the roles or titles explicitly given in the article text. "
-        "If the article does not clearly state that someone is the current or former holder of a role, "
-        "just use their name without a title. Never call anyone 'current president' or 'former president' "
-        "unless those exact words appear in the article excerpt."
-    ),
-},
-
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=900,
+    return briefing.call_openai(client, MODEL, SYSTEM_PROMPT, prompt)
+
+
+def ask_chatgpt(prompt: str, items) -> str:
+    """Return the summary for prompt, from the LLM cache when possible."""
+    key = llm_cache.prompt_key(MODEL, SYSTEM_PROMPT, prompt)
+    # Exact prompt match first, then a near-duplicate article set, then the API
+    return llm_cache.semantic_get_or_set(
+        key, "news", items, client, lambda: _call_openai(prompt)
     )
-    return response.choices[0].message.content.strip()
 
 
 def build_sources_html(items):
@@ -185,8 +174,8 @@ def build_sources_html(items):
     lines = []
     for it in items:
         date_str = format_pub_date(it.get("pub_date_raw", ""))
-        title = it["title"]
-        link = it["link"]
+        title = it["title_html"]
+        link = it["link_html"]
         lines.append(
             f'<li><a href="{link}" target="_blank" rel="noopener noreferrer">{title}</a> '
             f'<span class="source-date">({date_str})</span></li>'
@@ -197,167 +186,82 @@ def build_sources_html(items):
     return html
     
 
-def sanitize_political_titles(text: str) -> str:
-    """
-    Normalize references to U.S. Presidents so they always appear as 'President <Name>'.
-    Removes 'former' and 'current' prefixes without altering other titles.
-    """
+# Canonical spelling for each name the sanitizer rewrites
+_PRESIDENT_NAMES = {
+    "donald trump": "Donald Trump",
+    "joe biden": "Joe Biden",
+    "barack obama": "Barack Obama",
+}
 
-    corrections = {
-        r"\bformer president donald trump\b": "President Donald Trump",
-        r"\bformer President Donald Trump\b": "President Donald Trump",
-        r"\bcurrent president donald trump\b": "President Donald Trump",
-        r"\bcurrent President Donald Trump\b": "President Donald Trump",
+# All 'former'/'current' president prefixes in one case-insensitive pass
+_POLITICAL_RE = re.compile(
+    r"\b(?:(?:former|current) president (donald trump|joe biden)"
+    r"|former president (barack obama))\b",
+    re.IGNORECASE,
+)
 
-        r"\bformer president joe biden\b": "President Joe Biden",
-        r"\bformer President Joe Biden\b": "President Joe Biden",
-        r"\bcurrent president joe biden\b": "President Joe Biden",
-        r"\bcurrent President Joe Biden\b": "President Joe Biden",
 
-        r"\bformer president barack obama\b": "President Barack Obama",
-        r"\bformer President Barack Obama\b": "President Barack Obama",
-    }
+def _president_title(match):
+    """Replacement for _POLITICAL_RE: 'President' plus the canonical name."""
+    name = match.group(1) or match.group(2)
+    return "President " + _PRESIDENT_NAMES[name.lower()]
 
-    # Apply case-insensitive regex replacements
-    for pattern, replacement in corrections.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
 
-    return text
+def sanitize_political_titles(text: str) -> str:
+    """
+    Normalize references to U.S. Presidents so they always appear as 'President <Name>'.
+    Removes 'former' and 'current' prefixes without altering other titles.
+    """
+    return _POLITICAL_RE.sub(_president_title, text)
 
 
 
 
-def update_index_html(article_html: str):
+def _replace_article(html: str, article_html: str) -> str:
     """
-    Replace the content inside the <div id="article">...</div> block.
+    Return html with the content inside the <div id="article">...</div> block replaced.
     If no such div exists, create one before </body>.
     """
-    with open("index.html", "r", encoding="utf-8") as f:
-        html = f.read()
-
     # Store the update moment as a UTC timestamp; browser converts to local date
     updated_ts = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
-    marker_id = 'id="article"'
-    pos_id = html.find(marker_id)
-
-    if pos_id != -1:
-        # Found existing <div id="article">
-        start = html.rfind("<div", 0, pos_id)
-        if start == -1:
-            raise RuntimeError("Could not find opening <div> for id=\"article\"")
-
-        start_tag_end = html.find(">", start)
-        if start_tag_end == -1:
-            raise RuntimeError("Could not find end of <div ...> tag for id=\"article\"")
-
-        end = html.find("</div>", start_tag_end)
-        if end == -1:
-            raise RuntimeError("Could not find closing </div> for <div id=\"article\">")
-
-        before = html[: start_tag_end + 1]
-        after = html[end:]
-
-        inner_html = (
-            '\n<p class="article-date">Updated: '
-            f'<span id="updated-date" data-ts="{updated_ts}"></span>'
-            '</p>\n'
-            f'{article_html}\n'
-        )
-
-        new_html = before + inner_html + after
-
-    else:
-        # Fallback: no <div id="article"> found
-        print('Warning: id="article" not found; injecting a new article block.')
-
-        article_block = (
-            '\n<div id="article">\n'
-            '  <p class="article-date">Updated: '
-            f'<span id="updated-date" data-ts="{updated_ts}"></span>'
-            '</p>\n'
-            f'  {article_html}\n'
-            '</div>\n'
-        )
-
-        body_close = html.lower().rfind("</body>")
-        if body_close != -1:
-            new_html = html[:body_close] + article_block + html[body_close:]
-        else:
-            new_html = html + article_block
+    inner_html = (
+        '\n<p class="article-date">Updated: '
+        f'<span id="updated-date" data-ts="{updated_ts}"></span>'
+        '</p>\n'
+        f'{article_html}\n'
+    )
 
-    with open("index.html", "w", encoding="utf-8") as f:
-        f.write(new_html)
+    new_html = briefing.replace_article(html, inner_html)
+    if new_html is not None:
+        return new_html
 
+    # Fallback: no <div id="article"> found
+    print('Warning: id="article" not found; injecting a new article block.')
 
-def write_archive_page(article_html: str, today: datetime.date):
-    """Write/overwrite a daily archive page under archives/YYYY-MM-DD.html."""
-    date_slug = today.strftime("%Y-%m-%d")
-    display_date = today.strftime("%B %d, %Y")
+    article_block = (
+        '\n<div id="article">\n'
+        '  <p class="article-date">Updated: '
+        f'<span id="updated-date" data-ts="{updated_ts}"></span>'
+        '</p>\n'
+        f'  {article_html}\n'
+        '</div>\n'
+    )
 
-    archive_dir = "archives"
-    os.makedirs(archive_dir, exist_ok=True)
+    body_close = html.lower().rfind("</body>")
+    if body_close != -1:
+        return html[:body_close] + article_block + html[body_close:]
+    return html + article_block
 
-    path = os.path.join(archive_dir, f"{date_slug}.html")
 
-    page_html = f"""<!DOCTYPE html>
+# Daily archive page; styles live in static/archive.css so each page carries only its content
+_ARCHIVE_TEMPLATE = """<!DOCTYPE html>
 <html lang="en">
 <head>
   <meta charset="UTF-8" />
   <title>Heard It First – {display_date} Digest</title>
   <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <style>
-    body {{
-      margin: 0;
-      min-height: 100vh;
-      font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-      background: #020617;
-      color: #e5e7eb;
-      padding: 1.5rem;
-    }}
-    .page {{
-      max-width: 800px;
-      margin: 0 auto;
-    }}
-    h1 {{
-      margin-top: 0;
-      text-transform: uppercase;
-      letter-spacing: 0.08em;
-      font-size: 1.4rem;
-    }}
-    .date {{
-      margin-bottom: 1rem;
-      color: #9ca3af;
-      font-size: 0.9rem;
-      text-transform: uppercase;
-      letter-spacing: 0.12em;
-    }}
-    h2 {{
-      font-size: 1.1rem;
-      margin: 1.3rem 0 0.4rem;
-    }}
-    p {{
-      line-height: 1.7;
-      font-size: 0.95rem;
-    }}
-    ul {{
-      padding-left: 1.2rem;
-    }}
-    li {{
-      margin-bottom: 0.4rem;
-    }}
-    a {{
-      color: #38bdf8;
-      text-decoration: none;
-    }}
-    a:hover {{
-      text-decoration: underline;
-    }}
-    .back {{
-      margin-top: 1.5rem;
-      font-size: 0.9rem;
-    }}
-  </style>
+  <link rel="stylesheet" href="../static/archive.css" />
 </head>
 <body>
   <div class="page">
@@ -369,8 +273,33 @@ def write_archive_page(article_html: str, today: datetime.date):
 </body>
 </html>
 """
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(page_html)
+# Split once around the body so pages are written as prefix + article + suffix
+_ARCHIVE_PREFIX, _ARCHIVE_SUFFIX = _ARCHIVE_TEMPLATE.split("{article_html}")
+
+
+def write_archive_page(article_html: str, today: datetime.date):
+    """Write/overwrite a daily archive page under archives/YYYY-MM-DD.html."""
+    date_slug = today.strftime("%Y-%m-%d")
+    display_date = today.strftime("%B %d, %Y")
+
+    archive_dir = "archives"
+    os.makedirs(archive_dir, exist_ok=True)
+
+    path = os.path.join(archive_dir, f"{date_slug}.html")
+
+    prefix = _ARCHIVE_PREFIX.format(display_date=display_date)
+    briefing.atomic_write(path, prefix, article_html, _ARCHIVE_SUFFIX)
+
+
+@lru_cache(maxsize=None)
+def _archive_display_date(slug: str) -> str:
+    """Turn an archive slug (YYYY-MM-DD) into 'Month DD, YYYY'; ValueError if not a date."""
+    return datetime.datetime.strptime(slug, "%Y-%m-%d").strftime("%B %d, %Y")
+
+
+def _archive_list_item(slug: str) -> str:
+    """Return the archive-list <li> linking to archives/<slug>.html."""
+    return f'<li><a href="archives/{slug}.html">{_archive_display_date(slug)}</a></li>'
 
 
 def build_archive_list_items():
@@ -379,94 +308,116 @@ def build_archive_list_items():
     if not os.path.isdir(archive_dir):
         return []
 
-    entries = []
-    for name in os.listdir(archive_dir):
-        if not name.endswith(".html"):
+    with os.scandir(archive_dir) as it:
+        slugs = [
+            entry.name[:-5]  # strip ".html"
+            for entry in it
+            if entry.name.endswith(".html") and entry.is_file()
+        ]
+
+    # Zero-padded ISO dates sort lexically in date order, so there's no need
+    # to parse them just to sort; the length check keeps that true.
+    slugs.sort(reverse=True)
+    items = []
+    for slug in slugs:
+        if len(slug) != 10:
             continue
-        slug = name[:-5]  # strip ".html"
         try:
-            dt = datetime.datetime.strptime(slug, "%Y-%m-%d").date()
+            items.append(_archive_list_item(slug))
         except ValueError:
             continue
-        display = dt.strftime("%B %d, %Y")
-        url = f"archives/{name}"
-        entries.append((dt, display, url))
-
-    entries.sort(reverse=True)
-    items = [
-        f'<li><a href="{url}">{display}</a></li>'
-        for dt, display, url in entries
-    ]
     return items
 
 
-def update_archive_list_on_index():
-    """Update the <ul id="archive-list">...</ul> block in index.html."""
-    with open("index.html", "r", encoding="utf-8") as f:
-        html = f.read()
+# Matches the <ul id="archive-list">...</ul> block: opening tag, items, closing tag
+_ARCHIVE_LIST_RE = re.compile(r'(<ul[^>]*id="archive-list"[^>]*>)(.*?)(</ul>)', re.DOTALL)
+
+
+def _replace_archive_list(html: str, archive_items) -> str:
+    """Return html with the <ul id="archive-list">...</ul> block filled from archive_items."""
+    if not archive_items:
+        inner = '\n<li class="archive-empty">No archives yet.</li>\n'
+    else:
+        inner = "\n" + "\n".join(archive_items) + "\n"
 
-    marker_id = 'id="archive-list"'
-    pos_id = html.find(marker_id)
-    if pos_id == -1:
+    new_html, count = _ARCHIVE_LIST_RE.subn(
+        lambda m: m.group(1) + inner + m.group(3), html, count=1
+    )
+    if count == 0:
         print('No archive-list element found; skipping archive list update.')
-        return
+        return html
+    return new_html
 
-    start = html.rfind("<ul", 0, pos_id)
-    if start == -1:
-        print("Could not find <ul> for archive-list; skipping.")
-        return
 
-    start_tag_end = html.find(">", start)
-    if start_tag_end == -1:
-        print("Could not find end of <ul> tag for archive-list; skipping.")
-        return
+# One <li> entry inside the archive list
+_ARCHIVE_ITEM_RE = re.compile(r"<li\b.*?</li>", re.DOTALL)
 
-    end = html.find("</ul>", start_tag_end)
-    if end == -1:
-        print("Could not find closing </ul> for archive-list; skipping.")
-        return
 
-    before = html[: start_tag_end + 1]
-    after = html[end:]
+def _current_archive_items(html: str):
+    """Return the archive <li> entries already in html, ignoring the empty-list placeholder."""
+    match = _ARCHIVE_LIST_RE.search(html)
+    if not match:
+        return []
+    return [
+        li for li in _ARCHIVE_ITEM_RE.findall(match.group(2))
+        if 'class="archive-empty"' not in li
+    ]
+
 
-    items = build_archive_list_items()
+def _with_archive_entry(archive_items, date_slug: str):
+    """Return archive_items with date_slug's entry at the top, unless it is already listed."""
+    href = f'href="archives/{date_slug}.html"'
+    if any(href in li for li in archive_items):
+        return archive_items
+    return [_archive_list_item(date_slug)] + archive_items
 
-    if not items:
-        inner = '\n<li class="archive-empty">No archives yet.</li>\n'
+
+def rewrite_index(article_html: str, today=None):
+    """
+    Update the article and the archive list in index.html with one read and one write.
+    When today is given and the page already lists archives, today's entry is
+    prepended to that list; otherwise the list is rebuilt from archives/.
+    """
+    with open("index.html", "r", encoding="utf-8") as f:
+        html = f.read()
+
+    current_items = _current_archive_items(html)
+    if today is not None and current_items:
+        archive_items = _with_archive_entry(current_items, today.strftime("%Y-%m-%d"))
     else:
-        inner = "\n" + "\n".join(items) + "\n"
+        archive_items = build_archive_list_items()
 
-    new_html = before + inner + after
+    html = _replace_article(html, article_html)
+    html = _replace_archive_list(html, archive_items)
 
-    with open("index.html", "w", encoding="utf-8") as f:
-        f.write(new_html)
+    briefing.atomic_write("index.html", html)
 
 
-def main():
+def summarize(items):
+    """Return the model's (possibly cached) summary of items, or None if there are none."""
+    if not items:
+        return None
+
+    # Build prompt and get summary from the model
+    prompt = build_prompt(items)
+    return ask_chatgpt(prompt, items)
+
+
+def publish(items, summary):
+    """Render the summary plus sources into index.html and today's archive page."""
     # Use a local-ish date for archives
     try:
         today = get_local_date()
     except NameError:
         today = datetime.datetime.now(datetime.timezone.utc).date()
 
-    # Fetch news items from RSS feeds
-    items = fetch_rss_items()
     if not items:
         print("No news items fetched. Exiting.")
         fallback_html = "<p>We couldn't fetch any news right now. Please check back later.</p>"
         # Update main page with a friendly message
-        update_index_html(fallback_html)
-        # If archive list updater exists, call it safely
-        try:
-            update_archive_list_on_index()
-        except NameError:
-            pass
+        rewrite_index(fallback_html)
         return
 
-    # Build prompt and get summary from the model
-    prompt = build_prompt(items)
-    summary = ask_chatgpt(prompt)
-
     # Optional: sanitize political titles if the helper exists
     try:
         summary = sanitize_political_titles(summary)
@@ -479,37 +430,9 @@ def main():
         if not line.strip().startswith("Updated:")
     )
 
-    # Convert the summary into HTML: H2 for markdown headers, P for regular text
-    summary_html = ""
-    current_section_title = None  # track which section we're in
-
-    for block in summary.split("\n\n"):
-        text = block.strip()
-        if not text:
-            continue
-
-        # If ChatGPT produced a markdown-style header (### Title)
-        if text.startswith("###"):
-            clean_title = text.lstrip("#").strip()
-            current_section_title = clean_title  # remember which section we're in
-            summary_html += f"<h2>{clean_title}</h2>\n"
-        else:
-            # Are we currently in the "Other notable events" section?
-            in_other_notable = (
-                current_section_title
-                and "other notable events" in current_section_title.strip().lower()
-            )
-
-            if in_other_notable:
-                # Split this block into separate paragraphs per sentence
-                sentences = [s.strip() for s in text.split(". ") if s.strip()]
-                for s in sentences:
-                    if not s.endswith("."):
-                        s += "."
-                    summary_html += f"<p>{s}</p>\n"
-            else:
-                # All other sections stay as one paragraph
-                summary_html += f"<p>{text}</p>\n"
+    # Convert the summary into HTML: H2 for markdown headers, P for regular text;
+    # the "Other notable events" section gets one paragraph per sentence
+    summary_html = briefing.summary_to_html(summary, sentence_sections=("other notable events",))
 
     # Build sources block with dates
     sources_html = build_sources_html(items)
@@ -523,16 +446,17 @@ def main():
     except NameError:
         pass
 
-    # 2) Update the main index article
-    update_index_html(full_html)
-
-    # 3) Refresh the archive list sidebar, if available
-    try:
-        update_archive_list_on_index()
-    except NameError:
-        pass
+    # 2) Update the main index article and add today to the archive list sidebar
+    rewrite_index(full_html, today)
 
     print("index.html and archives updated with new daily brief and sources.")
 
+
+def main():
+    # Fetch news items from RSS feeds
+    items = fetch_rss_items()
+    publish(items, summarize(items))
+
+
 if __name__ == "__main__":
     main()
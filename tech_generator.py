@@ -1,11 +1,11 @@
 import os
 import datetime
 import textwrap
-import requests
-import xml.etree.ElementTree as ET
-from email.utils import parsedate_to_datetime
 from openai import OpenAI
 
+import briefing
+import llm_cache
+
 # ------------- CONFIG -------------
 
 TECH_FEEDS = [
@@ -17,76 +17,37 @@ TECH_FEEDS = [
 
 MAX_ARTICLES = 10
 
+MODEL = "gpt-4.1-mini"
+SYSTEM_PROMPT = "You write calm, simple, neutral technology news summaries."
+
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
 
 # ------------- HELPERS -------------
 
+def _parse_item(item):
+    """Turn one tech RSS <item> into an article dict, or None if it has no title."""
+    title = item.findtext("title", "").strip()
+    if not title:
+        return None
+    return {
+        "title": title,
+        "description": item.findtext("description", "").strip(),
+        "link": item.findtext("link", "").strip(),
+        "pub_raw": item.findtext("pubDate", "").strip(),
+    }
+
+
 def fetch_rss_items():
     """Pull items from tech RSS feeds."""
-    items = []
-
-    for feed in TECH_FEEDS:
-        try:
-            resp = requests.get(feed, timeout=10)
-            resp.raise_for_status()
-            root = ET.fromstring(resp.content)
-
-            for item in root.iter("item"):
-                title = item.findtext("title", "").strip()
-                desc = item.findtext("description", "").strip()
-                link = item.findtext("link", "").strip()
-                pub_raw = item.findtext("pubDate", "").strip()
-
-                if title:
-                    items.append({
-                        "title": title,
-                        "description": desc,
-                        "link": link,
-                        "pub_raw": pub_raw,
-                    })
-        except Exception as e:
-            print("Error fetching {}: {}".format(feed, e))
-
-    # De-duplicate by title
-    seen = set()
-    unique = []
-    for it in items:
-        if it["title"] not in seen:
-            seen.add(it["title"])
-            unique.append(it)
-
-    return unique[:MAX_ARTICLES]
-
-
-def format_date(raw):
-    """Convert RSS date -> YYYY-MM-DD."""
-    if not raw:
-        return "Unknown"
-    try:
-        dt = parsedate_to_datetime(raw)
-        return dt.date().strftime("%Y-%m-%d")
-    except Exception:
-        return raw
+    items = briefing.fetch_feeds(TECH_FEEDS, _parse_item, MAX_ARTICLES)
 
+    # De-duplicate by normalized title so cross-feed copies collapse
+    return briefing.dedupe_by_title(items)[:MAX_ARTICLES]
 
-def build_prompt(items):
-    """Make a prompt specifically for summarizing tech news."""
-    bullets = []
-    for i, it in enumerate(items, start=1):
-        bullets.append(
-            "{}. {}\n   Date: {}\n   {}\n   Link: {}".format(
-                i,
-                it["title"],
-                format_date(it["pub_raw"]),
-                it["description"],
-                it["link"],
-            )
-        )
-
-    articles_block = "\n\n".join(bullets)
-
-    prompt = """
+
+# Prompt wrapper around the article list, dedented once at import
+_PROMPT_TPL = textwrap.dedent("""
     Summarize today's most important TECHNOLOGY news into a clean, readable briefing.
 
     Requirements:
@@ -98,46 +59,30 @@ def build_prompt(items):
 
     Articles:
     {articles}
-    """.format(articles=articles_block)
+    """).strip()
+
+
+def build_prompt(items):
+    """Make a prompt specifically for summarizing tech news."""
+    articles_block = briefing.render_articles(items, lambda it: briefing.format_date(it["pub_raw"]))
 
-    return textwrap.dedent(prompt).strip()
+    return _PROMPT_TPL.format(articles=articles_block)
 
 
-def ask_chatgpt(prompt):
+def _call_openai(prompt):
     """Call OpenAI API."""
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "You write calm, simple, neutral technology news summaries.",
-            },
-            {
-                "role": "user",
-                "content": prompt,
-            },
-        ],
-        max_tokens=900,
-    )
-    return response.choices[0].message.content.strip()
+    return briefing.call_openai(client, MODEL, SYSTEM_PROMPT, prompt)
 
 
-def convert_summary_to_html(summary):
-    """Turn ChatGPT's markdown-like format into HTML blocks."""
-    html = ""
-
-    for block in summary.split("\n\n"):
-        text = block.strip()
-        if not text:
-            continue
+def ask_chatgpt(prompt):
+    """Return the summary for prompt, from the LLM cache when possible."""
+    key = llm_cache.prompt_key(MODEL, SYSTEM_PROMPT, prompt)
+    return llm_cache.get_or_set(key, lambda: _call_openai(prompt))
 
-        if text.startswith("###"):
-            title = text.lstrip("#").strip()
-            html += "<h2>{}</h2>\n".format(title)
-        else:
-            html += "<p>{}</p>\n".format(text)
 
-    return html
+def convert_summary_to_html(summary):
+    """Turn ChatGPT's markdown-like format into HTML blocks."""
+    return briefing.summary_to_html(summary)
 
 
 def update_tech_page(summary_html):
@@ -147,17 +92,6 @@ def update_tech_page(summary_html):
     with open("tech.html", "r", encoding="utf-8") as f:
         html = f.read()
 
-    marker = '<div id="article">'
-    start = html.find(marker)
-    if start == -1:
-        raise RuntimeError("tech.html missing <div id=\"article\">")
-
-    start_tag_end = html.find(">", start)
-    end = html.find("</div>", start_tag_end)
-
-    before = html[: start_tag_end + 1]
-    after = html[end:]
-
     inner_html = (
         "\n<p class=\"article-date\">Updated: "
         + today +
@@ -166,27 +100,40 @@ def update_tech_page(summary_html):
         "\n"
     )
 
-    new_html = before + inner_html + after
+    new_html = briefing.replace_article(html, inner_html)
+    if new_html is None:
+        raise RuntimeError("tech.html missing <div id=\"article\">")
 
-    with open("tech.html", "w", encoding="utf-8") as f:
-        f.write(new_html)
+    briefing.atomic_write("tech.html", new_html)
 
     print("tech.html updated with new tech summary.")
 
 
 # ------------- MAIN -------------
 
-def main():
-    items = fetch_rss_items()
+def summarize(items):
+    """Return the model's (possibly cached) summary of items, or None if there are none."""
+    if not items:
+        return None
+
+    prompt = build_prompt(items)
+    return ask_chatgpt(prompt)
+
+
+def publish(items, summary):
+    """Render the summary into tech.html."""
     if not items:
         print("No tech items fetched.")
         return
 
-    prompt = build_prompt(items)
-    summary = ask_chatgpt(prompt)
     summary_html = convert_summary_to_html(summary)
     update_tech_page(summary_html)
 
 
+def main():
+    items = fetch_rss_items()
+    publish(items, summarize(items))
+
+
 if __name__ == "__main__":
     main()